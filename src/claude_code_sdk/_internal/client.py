@@ -1,6 +1,7 @@
 """Internal client implementation."""
 
 from collections.abc import AsyncIterator
+from contextlib import aclosing
 from typing import Any
 
 from ..types import (
@@ -34,10 +35,13 @@ class InternalClient:
         try:
             await transport.connect()
 
-            async for data in transport.receive_messages():
-                message = self._parse_message(data)
-                if message:
-                    yield message
+            # Closed here, in this task, if the caller stops iterating early
+            async with aclosing(transport.receive_message_batches()) as batches:
+                async for batch in batches:
+                    for data in batch:
+                        message = self._parse_message(data)
+                        if message:
+                            yield message
 
         finally:
             await transport.disconnect()
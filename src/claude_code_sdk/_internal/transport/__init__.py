@@ -30,6 +30,11 @@ class Transport(ABC):
         """Receive messages from Claude."""
         pass
 
+    @abstractmethod
+    def receive_message_batches(self) -> AsyncIterator[list[dict[str, Any]]]:
+        """Receive messages from Claude, grouped as they arrive."""
+        pass
+
     @abstractmethod
     def is_connected(self) -> bool:
         """Check if transport is connected."""
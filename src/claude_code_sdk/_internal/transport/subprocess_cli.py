@@ -1,16 +1,25 @@
 """Subprocess transport implementation using Claude Code CLI."""
 
+import functools
 import json
+import math
 import os
 import shutil
-from collections.abc import AsyncIterator
+import stat
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterator,
+)
+from contextlib import aclosing
 from pathlib import Path
 from subprocess import PIPE
 from typing import Any
 
 import anyio
-from anyio.abc import Process
-from anyio.streams.text import TextReceiveStream
+from anyio.abc import ByteReceiveStream, Process
 
 from ..._errors import CLIConnectionError, CLINotFoundError, ProcessError
 from ..._errors import CLIJSONDecodeError as SDKJSONDecodeError
@@ -18,6 +27,226 @@ from ...types import ClaudeCodeOptions
 from . import Transport
 
 
+def _reject_constant(name: str) -> Any:
+    """Reject NaN and Infinity, which aren't valid JSON."""
+    raise ValueError(f"Invalid JSON constant: {name}")
+
+
+def _parse_finite_float(text: str) -> float:
+    """Parse a JSON number, rejecting ones too large for a float."""
+    value = float(text)
+    if math.isinf(value):
+        raise ValueError(f"Number out of range: {text}")
+    return value
+
+
+def _stdlib_json_loads(data: bytes | memoryview) -> Any:
+    """Decode JSON with the standard library, as strictly as msgspec and orjson.
+
+    The input is decoded as strict UTF-8 first; json.loads would otherwise also
+    accept a BOM or UTF-16/32 bytes. NaN, Infinity and numbers that overflow a
+    float are rejected rather than decoded to nan or inf.
+    """
+    return json.loads(
+        bytes(data).decode(),
+        parse_constant=_reject_constant,
+        parse_float=_parse_finite_float,
+    )
+
+
+def _select_json_loads() -> Callable[[bytes | memoryview], Any]:
+    """Pick the fastest decoder installed: msgspec, then orjson, then json.
+
+    All three raise a ValueError subclass on malformed, non-UTF-8 or
+    non-finite input. They still differ on integers wider than 64 bits, which
+    orjson decodes to a float; stream-json messages don't carry such values.
+    """
+    try:
+        import msgspec
+    except ImportError:
+        pass
+    else:
+        return msgspec.json.Decoder(dict).decode
+
+    try:
+        import orjson
+    except ImportError:
+        return _stdlib_json_loads
+    return orjson.loads
+
+
+_json_loads = _select_json_loads()
+
+# Bytes requested per read from the CLI pipes; the same as anyio's default
+_PIPE_READ_SIZE = 64 * 1024
+# Number of stdout chunks read ahead of the parser
+_STDOUT_BUFFERED_CHUNKS = 16
+
+# Largest single stdout line (one message) accepted from the CLI
+_MAX_BUFFER_SIZE = 50 * 1024 * 1024  # 50MB limit
+
+# Print stdout lines that fail to decode in full, untruncated
+_DEBUG_JSON = os.environ.get("CLAUDE_CODE_DEBUG_JSON", "").lower() == "true"
+
+# Bytes of trailing stderr kept for error reporting
+_MAX_STDERR_SIZE = 128 * 1024
+
+
+@functools.lru_cache(maxsize=1)
+def _find_cli() -> str:
+    """Find Claude Code CLI binary.
+
+    A successful lookup is cached for the life of the process; a failed one
+    raises and is retried on the next call.
+    """
+    if cli := shutil.which("claude"):
+        return cli
+
+    locations = [
+        Path.home() / ".npm-global/bin/claude",
+        Path("/usr/local/bin/claude"),
+        Path.home() / ".local/bin/claude",
+        Path.home() / "node_modules/.bin/claude",
+        Path.home() / ".yarn/bin/claude",
+    ]
+
+    for path in locations:
+        # One stat per candidate instead of exists() followed by is_file()
+        try:
+            if stat.S_ISREG(path.stat().st_mode):
+                return str(path)
+        except OSError:
+            continue
+
+    node_installed = shutil.which("node") is not None
+
+    if not node_installed:
+        error_msg = "Claude Code requires Node.js, which is not installed.\n\n"
+        error_msg += "Install Node.js from: https://nodejs.org/\n"
+        error_msg += "\nAfter installing Node.js, install Claude Code:\n"
+        error_msg += "  npm install -g @anthropic-ai/claude-code"
+        raise CLINotFoundError(error_msg)
+
+    raise CLINotFoundError(
+        "Claude Code not found. Install with:\n"
+        "  npm install -g @anthropic-ai/claude-code\n"
+        "\nIf already installed locally, try:\n"
+        '  export PATH="$HOME/node_modules/.bin:$PATH"\n'
+        "\nOr specify the path when creating transport:\n"
+        "  SubprocessCLITransport(..., cli_path='/path/to/claude')"
+    )
+
+
+def _subprocess_env() -> dict[str, str] | None:
+    """Environment for the CLI process, or None to inherit ours unchanged.
+
+    The copy is only needed to add the entrypoint marker, so it is skipped when
+    the marker is already set. The environment is not cached across calls, as
+    that would hide changes made to os.environ after the first connect.
+    """
+    if os.environ.get("CLAUDE_CODE_ENTRYPOINT") == "sdk-py":
+        return None
+    return {**os.environ, "CLAUDE_CODE_ENTRYPOINT": "sdk-py"}
+
+
+def _decode_lines(buffer: bytearray, scan_from: int = 0) -> Iterator[Any]:
+    """Decode the complete lines in ``buffer`` and remove them from it.
+
+    stream-json emits exactly one JSON message per line, so every newline is a
+    message boundary; a line that doesn't parse is an error rather than the
+    start of a multi-line value.
+
+    Each line is decoded straight from a memoryview over the buffer, so no
+    per-line copy is made. A trailing partial line is left in the buffer.
+
+    The search for the first newline starts at ``scan_from``, so the caller can
+    skip bytes already known to hold none instead of rescanning a long partial
+    line on every chunk.
+    """
+    start = 0
+    with memoryview(buffer) as view:
+        while (end := buffer.find(b"\n", scan_from)) != -1:
+            with view[start:end] as line:
+                error: Exception | None = None
+                try:
+                    message = _json_loads(line)
+                except ValueError as e:
+                    error = e
+                else:
+                    # Every stream-json message is an object
+                    if not isinstance(message, dict):
+                        error = TypeError(
+                            f"Expected a JSON object, got {type(message).__name__}"
+                        )
+
+                if error is not None:
+                    text = line.tobytes().decode(errors="replace")
+                    if text.strip():
+                        if _DEBUG_JSON:
+                            print(f"[DEBUG] Invalid line: {text}")
+                        raise SDKJSONDecodeError(text[:1000], error) from error
+                    message = None
+            start = scan_from = end + 1
+            # Blank lines carry no message
+            if message is not None:
+                yield message
+
+    # Only resize once the view is released
+    del buffer[:start]
+
+
+def _decode_batch(
+    buffer: bytearray, scan_from: int = 0
+) -> tuple[list[Any], SDKJSONDecodeError | None]:
+    """Decode the complete lines in ``buffer`` into one batch.
+
+    A line that fails to decode ends the batch; the messages decoded before it
+    are returned together with the error so the caller can still deliver them.
+    """
+    batch: list[Any] = []
+    try:
+        for message in _decode_lines(buffer, scan_from):
+            batch.append(message)
+    except SDKJSONDecodeError as e:
+        return batch, e
+    return batch, None
+
+
+async def _iter_message_batches(
+    chunks: AsyncIterable[bytes], max_line_size: int
+) -> AsyncIterator[list[Any]]:
+    """Decode newline-delimited JSON, one batch of messages per chunk.
+
+    Partial lines are carried across chunks; chunks that complete no line
+    produce no batch. Messages decoded before an invalid line are yielded
+    before its error is raised.
+    """
+    pending = bytearray()
+    async for chunk in chunks:
+        scan_from = len(pending)
+        pending += chunk
+        batch, error = _decode_batch(pending, scan_from)
+        if batch:
+            yield batch
+        if error:
+            raise error
+
+        if len(pending) > max_line_size:
+            raise SDKJSONDecodeError(
+                f"JSON buffer exceeded {max_line_size} bytes. Response too large.",
+                ValueError("Buffer overflow"),
+            )
+
+    if pending:
+        scan_from = len(pending)
+        pending += b"\n"
+        batch, error = _decode_batch(pending, scan_from)
+        if batch:
+            yield batch
+        if error:
+            raise error
+
+
 class SubprocessCLITransport(Transport):
     """Subprocess transport using Claude Code CLI."""
 
@@ -29,89 +258,57 @@ class SubprocessCLITransport(Transport):
     ):
         self._prompt = prompt
         self._options = options
-        self._cli_path = str(cli_path) if cli_path else self._find_cli()
+        self._cli_path = str(cli_path) if cli_path else _find_cli()
         self._cwd = str(options.cwd) if options.cwd else None
+        self._cmd: list[str] | None = None
         self._process: Process | None = None
-        self._stdout_stream: TextReceiveStream | None = None
-        self._stderr_stream: TextReceiveStream | None = None
-
-    def _find_cli(self) -> str:
-        """Find Claude Code CLI binary."""
-        if cli := shutil.which("claude"):
-            return cli
-
-        locations = [
-            Path.home() / ".npm-global/bin/claude",
-            Path("/usr/local/bin/claude"),
-            Path.home() / ".local/bin/claude",
-            Path.home() / "node_modules/.bin/claude",
-            Path.home() / ".yarn/bin/claude",
-        ]
-
-        for path in locations:
-            if path.exists() and path.is_file():
-                return str(path)
-
-        node_installed = shutil.which("node") is not None
-
-        if not node_installed:
-            error_msg = "Claude Code requires Node.js, which is not installed.\n\n"
-            error_msg += "Install Node.js from: https://nodejs.org/\n"
-            error_msg += "\nAfter installing Node.js, install Claude Code:\n"
-            error_msg += "  npm install -g @anthropic-ai/claude-code"
-            raise CLINotFoundError(error_msg)
-
-        raise CLINotFoundError(
-            "Claude Code not found. Install with:\n"
-            "  npm install -g @anthropic-ai/claude-code\n"
-            "\nIf already installed locally, try:\n"
-            '  export PATH="$HOME/node_modules/.bin:$PATH"\n'
-            "\nOr specify the path when creating transport:\n"
-            "  SubprocessCLITransport(..., cli_path='/path/to/claude')"
-        )
+        self._stdout_stream: ByteReceiveStream | None = None
+        self._stderr_stream: ByteReceiveStream | None = None
 
     def _build_command(self) -> list[str]:
         """Build CLI command with arguments."""
-        cmd = [self._cli_path, "--output-format", "stream-json", "--verbose"]
+        cmd: list[str] = [self._cli_path, "--output-format", "stream-json", "--verbose"]
 
         if self._options.system_prompt:
-            cmd.extend(["--system-prompt", self._options.system_prompt])
+            cmd += ("--system-prompt", self._options.system_prompt)
 
         if self._options.append_system_prompt:
-            cmd.extend(["--append-system-prompt", self._options.append_system_prompt])
+            cmd += ("--append-system-prompt", self._options.append_system_prompt)
 
         if self._options.allowed_tools:
-            cmd.extend(["--allowedTools", ",".join(self._options.allowed_tools)])
+            cmd += ("--allowedTools", ",".join(self._options.allowed_tools))
 
         if self._options.max_turns:
-            cmd.extend(["--max-turns", str(self._options.max_turns)])
+            cmd += ("--max-turns", str(self._options.max_turns))
 
         if self._options.disallowed_tools:
-            cmd.extend(["--disallowedTools", ",".join(self._options.disallowed_tools)])
+            cmd += ("--disallowedTools", ",".join(self._options.disallowed_tools))
 
         if self._options.model:
-            cmd.extend(["--model", self._options.model])
+            cmd += ("--model", self._options.model)
 
         if self._options.permission_prompt_tool_name:
-            cmd.extend(
-                ["--permission-prompt-tool", self._options.permission_prompt_tool_name]
+            cmd += (
+                "--permission-prompt-tool",
+                self._options.permission_prompt_tool_name,
             )
 
         if self._options.permission_mode:
-            cmd.extend(["--permission-mode", self._options.permission_mode])
+            cmd += ("--permission-mode", self._options.permission_mode)
 
         if self._options.continue_conversation:
             cmd.append("--continue")
 
         if self._options.resume:
-            cmd.extend(["--resume", self._options.resume])
+            cmd += ("--resume", self._options.resume)
 
         if self._options.mcp_servers:
-            cmd.extend(
-                ["--mcp-config", json.dumps({"mcpServers": self._options.mcp_servers})]
+            cmd += (
+                "--mcp-config",
+                json.dumps({"mcpServers": self._options.mcp_servers}),
             )
 
-        cmd.extend(["--print", self._prompt])
+        cmd += ("--print", self._prompt)
         return cmd
 
     async def connect(self) -> None:
@@ -119,21 +316,25 @@ class SubprocessCLITransport(Transport):
         if self._process:
             return
 
-        cmd = self._build_command()
+        # Options don't change over the transport's lifetime, so reconnects
+        # reuse the command built on the first connect
+        if self._cmd is None:
+            self._cmd = self._build_command()
+
         try:
             self._process = await anyio.open_process(
-                cmd,
+                self._cmd,
                 stdin=None,
                 stdout=PIPE,
                 stderr=PIPE,
                 cwd=self._cwd,
-                env={**os.environ, "CLAUDE_CODE_ENTRYPOINT": "sdk-py"},
+                env=_subprocess_env(),
             )
 
             if self._process.stdout:
-                self._stdout_stream = TextReceiveStream(self._process.stdout)
+                self._stdout_stream = self._process.stdout
             if self._process.stderr:
-                self._stderr_stream = TextReceiveStream(self._process.stderr)
+                self._stderr_stream = self._process.stderr
 
         except FileNotFoundError as e:
             raise CLINotFoundError(f"Claude Code not found at: {self._cli_path}") from e
@@ -165,122 +366,93 @@ class SubprocessCLITransport(Transport):
 
     async def receive_messages(self) -> AsyncIterator[dict[str, Any]]:
         """Receive messages from CLI."""
+        async with aclosing(self.receive_message_batches()) as batches:
+            async for batch in batches:
+                for data in batch:
+                    yield data
+
+    async def receive_message_batches(
+        self,
+    ) -> AsyncGenerator[list[dict[str, Any]], None]:
+        """Receive messages from CLI, batched by stdout read.
+
+        All messages completed by one read from the CLI are yielded together,
+        so bursts of output cost one iteration instead of one per message.
+        """
         if not self._process or not self._stdout_stream:
             raise CLIConnectionError("Not connected")
+        stdout_stream = self._stdout_stream
 
-        stderr_lines = []
+        # Keep only the tail of stderr so a chatty process can't grow it unbounded
+        stderr_tail = bytearray()
+        stderr_truncated = False
+        stderr_stream = self._stderr_stream
 
         async def read_stderr() -> None:
             """Read stderr in background."""
-            if self._stderr_stream:
+            nonlocal stderr_truncated
+            if not stderr_stream:
+                return
+            while True:
                 try:
-                    async for line in self._stderr_stream:
-                        stderr_lines.append(line.strip())
-                except anyio.ClosedResourceError:
-                    pass
+                    chunk = await stderr_stream.receive(_PIPE_READ_SIZE)
+                except (anyio.EndOfStream, anyio.ClosedResourceError):
+                    break
+                stderr_tail.extend(chunk)
+                if len(stderr_tail) > _MAX_STDERR_SIZE:
+                    del stderr_tail[:-_MAX_STDERR_SIZE]
+                    stderr_truncated = True
+
+        # Reading stdout runs in its own task and hands chunks over through a
+        # bounded buffer, so pipe reads overlap with parsing
+        send_chunks, receive_chunks = anyio.create_memory_object_stream[bytes](
+            max_buffer_size=_STDOUT_BUFFERED_CHUNKS
+        )
 
-        async with anyio.create_task_group() as tg:
+        async def read_stdout() -> None:
+            """Read stdout in background."""
+            async with send_chunks:
+                while True:
+                    try:
+                        chunk = await stdout_stream.receive(_PIPE_READ_SIZE)
+                    except (anyio.EndOfStream, anyio.ClosedResourceError):
+                        break
+                    await send_chunks.send(chunk)
+
+        decode_error: SDKJSONDecodeError | None = None
+        async with anyio.create_task_group() as tg, receive_chunks:
             tg.start_soon(read_stderr)
+            tg.start_soon(read_stdout)
 
             try:
-                json_buffer = ""
-                brace_count = 0
-                bracket_count = 0
-                in_string = False
-                escape_next = False
-                MAX_BUFFER_SIZE = 50 * 1024 * 1024  # 50MB limit
-                
-                debug_json = os.environ.get("CLAUDE_CODE_DEBUG_JSON", "").lower() == "true"
-                
-                async for line in self._stdout_stream:
-                    line_str = line.strip()
-                    if not line_str:
-                        continue
-                    
-                    if debug_json:
-                        print(f"[DEBUG] Line: {line_str[:100]}...")
-                        print(f"[DEBUG] Buffer size: {len(json_buffer)}, Braces: {brace_count}, Brackets: {bracket_count}, In string: {in_string}")
-
-                    # Check buffer size before adding
-                    if len(json_buffer) + len(line_str) > MAX_BUFFER_SIZE:
-                        # Buffer too large, likely a streaming issue
-                        raise SDKJSONDecodeError(
-                            f"JSON buffer exceeded {MAX_BUFFER_SIZE} bytes. Response too large.",
-                            ValueError("Buffer overflow")
-                        )
-                    
-                    # Add line to buffer
-                    if json_buffer:
-                        json_buffer += "\n" + line_str
-                    else:
-                        json_buffer = line_str
-                    
-                    # Count braces and brackets to detect complete JSON
-                    # Only process the new line, not the entire buffer
-                    i = 0
-                    while i < len(line_str):
-                        char = line_str[i]
-                        
-                        if in_string:
-                            if escape_next:
-                                escape_next = False
-                            elif char == '\\':
-                                escape_next = True
-                            elif char == '"':
-                                in_string = False
-                        else:
-                            if char == '"':
-                                in_string = True
-                            elif char == '{':
-                                brace_count += 1
-                            elif char == '}':
-                                brace_count -= 1
-                            elif char == '[':
-                                bracket_count += 1
-                            elif char == ']':
-                                bracket_count -= 1
-                        
-                        i += 1
-                    
-                    # Check if we have a complete JSON object
-                    if json_buffer and brace_count == 0 and bracket_count == 0 and not in_string:
-                        try:
-                            data = json.loads(json_buffer)
-                            try:
-                                yield data
-                            except GeneratorExit:
-                                # Handle generator cleanup gracefully
-                                return
-                            # Reset buffer and counters
-                            json_buffer = ""
-                            brace_count = 0
-                            bracket_count = 0
-                            in_string = False
-                            escape_next = False
-                        except json.JSONDecodeError as e:
-                            # If it starts with JSON but fails to parse, it might be incomplete
-                            if json_buffer.startswith("{") or json_buffer.startswith("["):
-                                # Only continue if we haven't exceeded reasonable size
-                                if len(json_buffer) < MAX_BUFFER_SIZE:
-                                    continue
-                                else:
-                                    # Too large and still invalid
-                                    raise SDKJSONDecodeError(json_buffer[:1000] + "...", e) from e
-                            else:
-                                # Not JSON, reset buffer and counters
-                                json_buffer = ""
-                                brace_count = 0
-                                bracket_count = 0
-                                in_string = False
-                                escape_next = False
-                                continue
+                async for batch in _iter_message_batches(
+                    receive_chunks, _MAX_BUFFER_SIZE
+                ):
+                    try:
+                        yield batch
+                    except GeneratorExit:
+                        # Handle generator cleanup gracefully
+                        tg.cancel_scope.cancel()
+                        return
 
             except anyio.ClosedResourceError:
                 pass
+            except SDKJSONDecodeError as e:
+                # Re-raised outside the task group so callers get the error
+                # itself rather than an exception group
+                decode_error = e
+                tg.cancel_scope.cancel()
+
+        if decode_error:
+            raise decode_error
 
         await self._process.wait()
         if self._process.returncode is not None and self._process.returncode != 0:
-            stderr_output = "\n".join(stderr_lines)
+            if stderr_truncated:
+                # Start at a line boundary rather than mid-line or mid-character
+                del stderr_tail[: stderr_tail.find(b"\n") + 1]
+            # Decoded only once it's needed for the error
+            stderr_output = stderr_tail.decode(errors="replace").strip()
             if stderr_output and "error" in stderr_output.lower():
                 raise ProcessError(
                     "CLI process failed",
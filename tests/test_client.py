@@ -5,6 +5,7 @@ from unittest.mock import AsyncMock, patch
 import anyio
 
 from claude_code_sdk import AssistantMessage, ClaudeCodeOptions, query
+from claude_code_sdk._internal.client import InternalClient
 from claude_code_sdk.types import TextBlock
 
 
@@ -78,25 +79,29 @@ class TestQueryFunction:
 
                 # Mock the message stream
                 async def mock_receive():
-                    yield {
-                        "type": "assistant",
-                        "message": {
-                            "role": "assistant",
-                            "content": [{"type": "text", "text": "Done"}],
-                        },
-                    }
-                    yield {
-                        "type": "result",
-                        "subtype": "success",
-                        "duration_ms": 1000,
-                        "duration_api_ms": 800,
-                        "is_error": False,
-                        "num_turns": 1,
-                        "session_id": "test-session",
-                        "total_cost_usd": 0.001,
-                    }
-
-                mock_transport.receive_messages = mock_receive
+                    yield [
+                        {
+                            "type": "assistant",
+                            "message": {
+                                "role": "assistant",
+                                "content": [{"type": "text", "text": "Done"}],
+                            },
+                        }
+                    ]
+                    yield [
+                        {
+                            "type": "result",
+                            "subtype": "success",
+                            "duration_ms": 1000,
+                            "duration_api_ms": 800,
+                            "is_error": False,
+                            "num_turns": 1,
+                            "session_id": "test-session",
+                            "total_cost_usd": 0.001,
+                        }
+                    ]
+
+                mock_transport.receive_message_batches = mock_receive
                 mock_transport.connect = AsyncMock()
                 mock_transport.disconnect = AsyncMock()
 
@@ -112,3 +117,44 @@ class TestQueryFunction:
                 assert call_kwargs["options"].cwd == "/custom/path"
 
         anyio.run(_test)
+
+
+class TestInternalClient:
+    """Test the internal client."""
+
+    def test_process_query_early_close(self):
+        """Test that stopping early closes the transport's message stream."""
+
+        async def _test():
+            with patch(
+                "claude_code_sdk._internal.client.SubprocessCLITransport"
+            ) as mock_transport_class:
+                mock_transport = AsyncMock()
+                mock_transport_class.return_value = mock_transport
+                closed = False
+
+                async def mock_receive():
+                    nonlocal closed
+                    try:
+                        yield [
+                            {
+                                "type": "assistant",
+                                "message": {"content": [{"type": "text", "text": "1"}]},
+                            }
+                        ]
+                        yield [{"type": "assistant", "message": {"content": []}}]
+                    finally:
+                        closed = True
+
+                mock_transport.receive_message_batches = mock_receive
+
+                messages = InternalClient().process_query(
+                    prompt="test", options=ClaudeCodeOptions()
+                )
+                assert isinstance(await messages.__anext__(), AssistantMessage)
+                await messages.aclose()
+
+                assert closed
+                mock_transport.disconnect.assert_awaited_once()
+
+        anyio.run(_test)
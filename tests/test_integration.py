@@ -15,6 +15,7 @@ from claude_code_sdk import (
     ResultMessage,
     query,
 )
+from claude_code_sdk._internal.transport.subprocess_cli import _find_cli
 from claude_code_sdk.types import ToolUseBlock
 
 
@@ -33,25 +34,29 @@ class TestIntegration:
 
                 # Mock the message stream
                 async def mock_receive():
-                    yield {
-                        "type": "assistant",
-                        "message": {
-                            "role": "assistant",
-                            "content": [{"type": "text", "text": "2 + 2 equals 4"}],
-                        },
-                    }
-                    yield {
-                        "type": "result",
-                        "subtype": "success",
-                        "duration_ms": 1000,
-                        "duration_api_ms": 800,
-                        "is_error": False,
-                        "num_turns": 1,
-                        "session_id": "test-session",
-                        "total_cost_usd": 0.001,
-                    }
-
-                mock_transport.receive_messages = mock_receive
+                    yield [
+                        {
+                            "type": "assistant",
+                            "message": {
+                                "role": "assistant",
+                                "content": [{"type": "text", "text": "2 + 2 equals 4"}],
+                            },
+                        }
+                    ]
+                    yield [
+                        {
+                            "type": "result",
+                            "subtype": "success",
+                            "duration_ms": 1000,
+                            "duration_api_ms": 800,
+                            "is_error": False,
+                            "num_turns": 1,
+                            "session_id": "test-session",
+                            "total_cost_usd": 0.001,
+                        }
+                    ]
+
+                mock_transport.receive_message_batches = mock_receive
                 mock_transport.connect = AsyncMock()
                 mock_transport.disconnect = AsyncMock()
 
@@ -87,36 +92,40 @@ class TestIntegration:
 
                 # Mock the message stream with tool use
                 async def mock_receive():
-                    yield {
-                        "type": "assistant",
-                        "message": {
-                            "role": "assistant",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": "Let me read that file for you.",
-                                },
-                                {
-                                    "type": "tool_use",
-                                    "id": "tool-123",
-                                    "name": "Read",
-                                    "input": {"file_path": "/test.txt"},
-                                },
-                            ],
-                        },
-                    }
-                    yield {
-                        "type": "result",
-                        "subtype": "success",
-                        "duration_ms": 1500,
-                        "duration_api_ms": 1200,
-                        "is_error": False,
-                        "num_turns": 1,
-                        "session_id": "test-session-2",
-                        "total_cost_usd": 0.002,
-                    }
-
-                mock_transport.receive_messages = mock_receive
+                    yield [
+                        {
+                            "type": "assistant",
+                            "message": {
+                                "role": "assistant",
+                                "content": [
+                                    {
+                                        "type": "text",
+                                        "text": "Let me read that file for you.",
+                                    },
+                                    {
+                                        "type": "tool_use",
+                                        "id": "tool-123",
+                                        "name": "Read",
+                                        "input": {"file_path": "/test.txt"},
+                                    },
+                                ],
+                            },
+                        }
+                    ]
+                    yield [
+                        {
+                            "type": "result",
+                            "subtype": "success",
+                            "duration_ms": 1500,
+                            "duration_api_ms": 1200,
+                            "is_error": False,
+                            "num_turns": 1,
+                            "session_id": "test-session-2",
+                            "total_cost_usd": 0.002,
+                        }
+                    ]
+
+                mock_transport.receive_message_batches = mock_receive
                 mock_transport.connect = AsyncMock()
                 mock_transport.disconnect = AsyncMock()
 
@@ -145,9 +154,10 @@ class TestIntegration:
         """Test handling when CLI is not found."""
 
         async def _test():
+            _find_cli.cache_clear()
             with (
                 patch("shutil.which", return_value=None),
-                patch("pathlib.Path.exists", return_value=False),
+                patch("pathlib.Path.stat", side_effect=FileNotFoundError),
                 pytest.raises(CLINotFoundError) as exc_info,
             ):
                 async for _ in query(prompt="test"):
@@ -169,20 +179,22 @@ class TestIntegration:
 
                 # Mock the message stream
                 async def mock_receive():
-                    yield {
-                        "type": "assistant",
-                        "message": {
-                            "role": "assistant",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": "Continuing from previous conversation",
-                                }
-                            ],
-                        },
-                    }
-
-                mock_transport.receive_messages = mock_receive
+                    yield [
+                        {
+                            "type": "assistant",
+                            "message": {
+                                "role": "assistant",
+                                "content": [
+                                    {
+                                        "type": "text",
+                                        "text": "Continuing from previous conversation",
+                                    }
+                                ],
+                            },
+                        }
+                    ]
+
+                mock_transport.receive_message_batches = mock_receive
                 mock_transport.connect = AsyncMock()
                 mock_transport.disconnect = AsyncMock()
 
@@ -4,11 +4,79 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import anyio
 import pytest
+from anyio.abc import ByteReceiveStream
 
-from claude_code_sdk._internal.transport.subprocess_cli import SubprocessCLITransport
+from claude_code_sdk._internal.transport import subprocess_cli
+from claude_code_sdk._internal.transport.subprocess_cli import (
+    SubprocessCLITransport,
+    _find_cli,
+    _subprocess_env,
+)
 from claude_code_sdk.types import ClaudeCodeOptions
 
 
+@pytest.fixture(params=["msgspec", "orjson", "json"])
+def json_decoder(request, monkeypatch):
+    """Run the test against each supported JSON decoder."""
+    if request.param == "msgspec":
+        loads = pytest.importorskip("msgspec").json.Decoder(dict).decode
+    elif request.param == "orjson":
+        loads = pytest.importorskip("orjson").loads
+    else:
+        loads = subprocess_cli._stdlib_json_loads
+    monkeypatch.setattr(subprocess_cli, "_json_loads", loads)
+
+
+class _ChunkStream(ByteReceiveStream):
+    """Byte stream replaying fixed chunks, as a subprocess pipe would."""
+
+    def __init__(self, chunks: list[bytes], stay_open: bool = False):
+        self._chunks = list(chunks)
+        self._stay_open = stay_open
+
+    async def receive(self, max_bytes: int = 65536) -> bytes:
+        if not self._chunks:
+            if self._stay_open:
+                await anyio.sleep_forever()
+            raise anyio.EndOfStream
+        return self._chunks.pop(0)
+
+    async def aclose(self) -> None:
+        pass
+
+
+async def _connected_transport(
+    stdout_chunks: list[bytes],
+    stderr_chunks: list[bytes] | None = None,
+    returncode: int | None = 0,
+    stay_open: bool = False,
+) -> SubprocessCLITransport:
+    """Connect a transport to a fake process replaying canned output."""
+    with patch("anyio.open_process") as mock_exec:
+        mock_process = MagicMock()
+        mock_process.returncode = returncode
+        mock_process.wait = AsyncMock()
+        mock_process.stdout = _ChunkStream(stdout_chunks, stay_open=stay_open)
+        mock_process.stderr = _ChunkStream(stderr_chunks or [], stay_open=stay_open)
+        mock_exec.return_value = mock_process
+
+        transport = SubprocessCLITransport(
+            prompt="test", options=ClaudeCodeOptions(), cli_path="/usr/bin/claude"
+        )
+        await transport.connect()
+    return transport
+
+
+async def _collect_messages(
+    stdout_chunks: list[bytes],
+    stderr_chunks: list[bytes] | None = None,
+    returncode: int = 0,
+) -> list[dict]:
+    """Run receive_messages over canned process output."""
+    transport = await _connected_transport(stdout_chunks, stderr_chunks, returncode)
+    return [message async for message in transport.receive_messages()]
+
+
 class TestSubprocessCLITransport:
     """Test subprocess transport implementation."""
 
@@ -16,15 +84,29 @@ class TestSubprocessCLITransport:
         """Test CLI not found error."""
         from claude_code_sdk._errors import CLINotFoundError
 
+        _find_cli.cache_clear()
         with (
             patch("shutil.which", return_value=None),
-            patch("pathlib.Path.exists", return_value=False),
+            patch("pathlib.Path.stat", side_effect=FileNotFoundError),
             pytest.raises(CLINotFoundError) as exc_info,
         ):
             SubprocessCLITransport(prompt="test", options=ClaudeCodeOptions())
 
         assert "Claude Code requires Node.js" in str(exc_info.value)
 
+    def test_find_cli_is_cached(self):
+        """Test that a found CLI path is reused across transports."""
+        _find_cli.cache_clear()
+        try:
+            with patch("shutil.which", return_value="/opt/bin/claude") as mock_which:
+                first = SubprocessCLITransport(prompt="a", options=ClaudeCodeOptions())
+                second = SubprocessCLITransport(prompt="b", options=ClaudeCodeOptions())
+
+            assert first._cli_path == second._cli_path == "/opt/bin/claude"
+            mock_which.assert_called_once_with("claude")
+        finally:
+            _find_cli.cache_clear()
+
     def test_build_command_basic(self):
         """Test building basic CLI command."""
         transport = SubprocessCLITransport(
@@ -120,6 +202,43 @@ class TestSubprocessCLITransport:
 
         anyio.run(_test)
 
+    def test_reconnect_reuses_command(self):
+        """Test that the CLI command is built once per transport."""
+
+        async def _test():
+            with patch("anyio.open_process") as mock_exec:
+                mock_process = MagicMock()
+                mock_process.returncode = 0
+                mock_exec.return_value = mock_process
+
+                transport = SubprocessCLITransport(
+                    prompt="test",
+                    options=ClaudeCodeOptions(mcp_servers={"srv": {"command": "x"}}),
+                    cli_path="/usr/bin/claude",
+                )
+
+                with patch.object(
+                    transport, "_build_command", wraps=transport._build_command
+                ) as mock_build:
+                    await transport.connect()
+                    await transport.disconnect()
+                    await transport.connect()
+
+                mock_build.assert_called_once()
+                assert mock_exec.call_args_list[0] == mock_exec.call_args_list[1]
+
+        anyio.run(_test)
+
+    def test_subprocess_env(self):
+        """Test the entrypoint marker is passed without copying needlessly."""
+        with patch.dict("os.environ", {"CLAUDE_CODE_ENTRYPOINT": ""}):
+            env = _subprocess_env()
+            assert env is not None
+            assert env["CLAUDE_CODE_ENTRYPOINT"] == "sdk-py"
+
+        with patch.dict("os.environ", {"CLAUDE_CODE_ENTRYPOINT": "sdk-py"}):
+            assert _subprocess_env() is None
+
     def test_receive_messages(self):
         """Test parsing messages from CLI output."""
         # This test is simplified to just test the parsing logic
@@ -132,3 +251,197 @@ class TestSubprocessCLITransport:
         # So we just verify the transport can be created and basic structure is correct
         assert transport._prompt == "test"
         assert transport._cli_path == "/usr/bin/claude"
+
+    @pytest.mark.usefixtures("json_decoder")
+    def test_receive_messages_split_across_chunks(self):
+        """Test messages split across and packed into stdout chunks."""
+
+        async def _test():
+            messages = await _collect_messages(
+                [
+                    b'{"type": "system", "subtype": "in',
+                    b'it"}\n{"type": "assistant"}\n{"type": ',
+                    b'"result"}\n',
+                ]
+            )
+            assert [m["type"] for m in messages] == ["system", "assistant", "result"]
+
+        anyio.run(_test)
+
+    @pytest.mark.usefixtures("json_decoder")
+    def test_receive_messages_large_line_in_small_chunks(self):
+        """Test one long message arriving over many small reads."""
+
+        async def _test():
+            payload = b'{"type": "assistant", "text": "' + b"x" * (4 << 20) + b'"}\n'
+            chunks = [payload[i : i + 4096] for i in range(0, len(payload), 4096)]
+            messages = await _collect_messages(chunks)
+            assert len(messages) == 1
+            assert len(messages[0]["text"]) == 4 << 20
+
+        anyio.run(_test)
+
+    @pytest.mark.usefixtures("json_decoder")
+    def test_receive_messages_invalid_line(self):
+        """Test that a line which isn't a complete JSON message fails loudly."""
+        from claude_code_sdk._errors import CLIJSONDecodeError
+
+        async def _test():
+            with pytest.raises(CLIJSONDecodeError) as exc_info:
+                await _collect_messages(
+                    [b'{"type": "system"}\n{\n  "type": "assistant"\n}\n']
+                )
+
+            assert exc_info.value.line == "{"
+
+        anyio.run(_test)
+
+    @pytest.mark.usefixtures("json_decoder")
+    def test_receive_messages_before_invalid_line(self):
+        """Test that messages read together with an invalid line still arrive."""
+        from claude_code_sdk._errors import CLIJSONDecodeError
+
+        async def _test():
+            transport = await _connected_transport(
+                [b'{"type": "result", "ok": 1}\nnot json\n']
+            )
+            messages = []
+            with pytest.raises(CLIJSONDecodeError) as exc_info:
+                async for message in transport.receive_messages():
+                    messages.append(message)
+
+            assert messages == [{"type": "result", "ok": 1}]
+            assert exc_info.value.line == "not json"
+
+        anyio.run(_test)
+
+    @pytest.mark.usefixtures("json_decoder")
+    @pytest.mark.parametrize(
+        "line",
+        [
+            b"[1, 2]",
+            b'"text"',
+            b"null",
+            b'{"text": "\xff"}',
+            b'\xef\xbb\xbf{"type": "result"}',
+        ],
+        ids=["array", "string", "null", "invalid-utf8", "bom"],
+    )
+    def test_receive_messages_rejects_non_object_lines(self, line):
+        """Test that every decoder rejects lines that aren't a UTF-8 object."""
+        from claude_code_sdk._errors import CLIJSONDecodeError
+
+        async def _test():
+            with pytest.raises(CLIJSONDecodeError):
+                await _collect_messages([line + b"\n"])
+
+        anyio.run(_test)
+
+    @pytest.mark.usefixtures("json_decoder")
+    @pytest.mark.parametrize(
+        "line",
+        [
+            b'{"value": NaN}',
+            b'{"value": Infinity}',
+            b'{"value": -Infinity}',
+            b'{"value": 1e400}',
+        ],
+        ids=["nan", "infinity", "negative-infinity", "overflow"],
+    )
+    def test_receive_messages_rejects_non_finite_numbers(self, line):
+        """Test that every decoder rejects numbers that aren't finite."""
+        from claude_code_sdk._errors import CLIJSONDecodeError
+
+        async def _test():
+            with pytest.raises(CLIJSONDecodeError):
+                await _collect_messages([line + b"\n"])
+
+        anyio.run(_test)
+
+    @pytest.mark.usefixtures("json_decoder")
+    def test_receive_messages_skips_blank_lines(self):
+        """Test that empty and whitespace-only lines are ignored."""
+
+        async def _test():
+            messages = await _collect_messages([b'\n  \n{"type": "result"}\n\n'])
+            assert messages == [{"type": "result"}]
+
+        anyio.run(_test)
+
+    @pytest.mark.usefixtures("json_decoder")
+    def test_receive_messages_utf8_split_across_chunks(self):
+        """Test a multi-byte character split between two stdout chunks."""
+
+        async def _test():
+            encoded = '{"text": "café"}\n'.encode()
+            messages = await _collect_messages([encoded[:15], encoded[15:]])
+            assert messages == [{"text": "café"}]
+
+        anyio.run(_test)
+
+    def test_receive_messages_bounds_stderr(self, monkeypatch):
+        """Test that only whole lines from the tail of stderr are kept."""
+        from claude_code_sdk._errors import ProcessError
+
+        monkeypatch.setattr(subprocess_cli, "_MAX_STDERR_SIZE", 1000)
+
+        async def _test():
+            stderr = "".join(f"error {i}\n" for i in range(1500)).encode()
+            with pytest.raises(ProcessError) as exc_info:
+                await _collect_messages(
+                    [], [stderr[:7000], stderr[7000:]], returncode=1
+                )
+
+            assert exc_info.value.exit_code == 1
+            tail = exc_info.value.stderr
+            assert tail is not None
+            assert len(tail) <= 1000
+            lines = tail.splitlines()
+            assert lines[-1] == "error 1499"
+            assert all(line.startswith("error ") for line in lines)
+            assert [int(line.split()[1]) for line in lines] == list(
+                range(1500 - len(lines), 1500)
+            )
+
+        anyio.run(_test)
+
+    def test_receive_messages_early_close(self):
+        """Test closing the message iterator while the CLI is still running."""
+
+        async def _test():
+            transport = await _connected_transport(
+                [b'{"type": "assistant"}\n'], returncode=None, stay_open=True
+            )
+
+            with anyio.fail_after(1):
+                messages = transport.receive_messages()
+                assert await messages.__anext__() == {"type": "assistant"}
+                await messages.aclose()
+
+        anyio.run(_test)
+
+    @pytest.mark.usefixtures("json_decoder")
+    def test_receive_messages_crlf_and_indented_lines(self):
+        """Test CRLF line endings and leading whitespace on message lines."""
+
+        async def _test():
+            messages = await _collect_messages(
+                [b'{"type": "system"}\r\n  {"type": "result"}\r\n']
+            )
+            assert messages == [{"type": "system"}, {"type": "result"}]
+
+        anyio.run(_test)
+
+    @pytest.mark.usefixtures("json_decoder")
+    def test_receive_message_batches(self):
+        """Test that messages completed by one stdout read arrive together."""
+
+        async def _test():
+            transport = await _connected_transport(
+                [b'{"n": 1}\n{"n": 2}\n{"n": ', b"3}\n", b'{"n": 4}']
+            )
+            batches = [batch async for batch in transport.receive_message_batches()]
+
+            assert batches == [[{"n": 1}, {"n": 2}], [{"n": 3}], [{"n": 4}]]
+
+        anyio.run(_test)